@@ -10,10 +10,53 @@ import subprocess
 import json
 import time
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
+# apt touches these when `apt-get update` succeeds
+APT_UPDATE_STAMPS = [
+    "/var/lib/apt/periodic/update-success-stamp",
+    "/var/lib/apt/lists/partial",
+]
+APT_UPDATE_MAX_AGE = 3600  # seconds
+
+# Bookworm moved the firmware config under /boot/firmware
+BOOT_CONFIG_PATHS = [Path("/boot/firmware/config.txt"), Path("/boot/config.txt")]
+BOOT_CONFIG_LINES = ["dtparam=i2c_arm=on", "dtparam=spi=on", "enable_uart=1"]
+
+# Loaded atomically with iptables-restore / ip6tables-restore: SSH, HTTP
+# and HTTPS in, everything outbound. Like ufw's default before.rules we
+# also accept ping, DHCP replies, mDNS (so raspberrypi.local keeps
+# resolving) and SSDP; the v6 table also needs ICMPv6 for neighbour
+# discovery
+FIREWALL_PORTS_RULES = """-A INPUT -i lo -j ACCEPT
+-A INPUT -m conntrack --ctstate RELATED,ESTABLISHED -j ACCEPT
+-A INPUT -p tcp --dport 22 -j ACCEPT
+-A INPUT -p tcp --dport 80 -j ACCEPT
+-A INPUT -p tcp --dport 443 -j ACCEPT
+"""
+FIREWALL_V4_RULES = """-A INPUT -p icmp --icmp-type echo-request -j ACCEPT
+-A INPUT -p udp --sport 67 --dport 68 -j ACCEPT
+-A INPUT -p udp -d 224.0.0.251 --dport 5353 -j ACCEPT
+-A INPUT -p udp -d 239.255.255.250 --dport 1900 -j ACCEPT
+"""
+FIREWALL_V6_RULES = """-A INPUT -p ipv6-icmp -j ACCEPT
+-A INPUT -p udp -s fe80::/10 --sport 547 --dport 546 -j ACCEPT
+-A INPUT -p udp -d ff02::fb --dport 5353 -j ACCEPT
+-A INPUT -p udp -d ff02::c --dport 1900 -j ACCEPT
+"""
+FIREWALL_HEADER = """*filter
+:INPUT DROP [0:0]
+:FORWARD DROP [0:0]
+:OUTPUT ACCEPT [0:0]
+"""
+FIREWALL_RULES_V4 = FIREWALL_HEADER + FIREWALL_PORTS_RULES + FIREWALL_V4_RULES + "COMMIT\n"
+FIREWALL_RULES_V6 = FIREWALL_HEADER + FIREWALL_PORTS_RULES + FIREWALL_V6_RULES + "COMMIT\n"
+
 class AutoSetup:
-    def __init__(self):
+    def __init__(self, force_update=False):
+        self.force_update = force_update
+        self.reboot_required = False
         self.vehicle_id = self.get_vehicle_id()
         self.server_url = "https://your-vercel-app.vercel.app"  # Update this
         self.setup_dir = Path.home() / "geovan-vehicle-node"
@@ -25,68 +68,160 @@ class AutoSetup:
             return f"PI-{hostname.split('-')[-1] if '-' in hostname else '001'}"
         return f"PI-{int(time.time()) % 1000:03d}"
     
-    def run_command(self, command, check=True):
-        """Run shell command"""
+    def run_command(self, argv, check=True, input=None):
+        """Run command given as an argv list"""
+        # No shell=True: the command is exec'd directly, so each call
+        # skips starting /bin/sh just to parse the command line
         try:
-            result = subprocess.run(command, shell=True, check=check, 
+            result = subprocess.run(argv, check=check, input=input,
                                  capture_output=True, text=True)
             return result.returncode == 0, result.stdout, result.stderr
         except subprocess.CalledProcessError as e:
             return False, e.stdout, e.stderr
+        except OSError as e:
+            return False, "", str(e)
+    
+    def apt_lists_age(self):
+        """Seconds since the last successful apt-get update"""
+        mtimes = []
+        for stamp in APT_UPDATE_STAMPS:
+            try:
+                mtimes.append(os.stat(stamp).st_mtime)
+            except OSError:
+                pass
+        return time.time() - max(mtimes) if mtimes else float("inf")
     
     def update_system(self):
-        """Update Raspberry Pi system"""
-        print("🔄 Updating system packages...")
-        success, _, _ = self.run_command("sudo apt update && sudo apt upgrade -y")
+        """Refresh package indices"""
+        # No `apt upgrade`: install_dependencies already pulls current
+        # versions of what we need, and upgrading unrelated packages can
+        # take minutes on a Pi
+        if not self.force_update and self.apt_lists_age() < APT_UPDATE_MAX_AGE:
+            print("✅ Package lists are fresh, skipping update")
+            return
+        
+        print("🔄 Updating package lists...")
+        success, _, _ = self.run_command(["sudo", "apt-get", "update"])
         if success:
-            print("✅ System updated successfully")
+            print("✅ Package lists updated successfully")
         else:
-            print("⚠️ System update failed, continuing...")
+            print("⚠️ Package list update failed, continuing...")
+    
+    def install_packages(self, install_argv, packages):
+        """Install packages in one batch, falling back to one at a time
+        
+        Returns the packages that could not be installed.
+        """
+        success, _, stderr = self.run_command([*install_argv, *packages])
+        if success:
+            return []
+        
+        # A single unavailable package fails the whole batch; retry
+        # individually so everything else still gets installed
+        print(f"⚠️ Batch install failed, retrying one by one: {stderr.strip()}")
+        failed = []
+        for package in packages:
+            success, _, stderr = self.run_command([*install_argv, package])
+            if not success:
+                print(f"⚠️ Failed to install {package}: {stderr.strip()}")
+                failed.append(package)
+        return failed
     
     def install_dependencies(self):
         """Install required packages"""
         print("📦 Installing dependencies...")
         packages = [
             "python3", "python3-pip", "gpsd", "gpsd-clients", 
-            "i2c-tools", "python3-smbus", "python3-dev",
+            "i2c-tools", "python3-smbus", "python3-dev", "python3-cryptography",
             "build-essential", "libssl-dev", "libffi-dev",
             "python3-setuptools", "python3-wheel", "git",
             "curl", "wget", "vim", "htop", "ntp", "ntpdate",
-            "hostapd", "dnsmasq", "ufw"
+            "hostapd", "dnsmasq", "iptables", "iptables-persistent"
         ]
         
-        for package in packages:
-            print(f"Installing {package}...")
-            success, _, _ = self.run_command(f"sudo apt install -y {package}")
-            if not success:
-                print(f"⚠️ Failed to install {package}")
+        # One apt-get run for everything: dpkg's cache load, lock and
+        # trigger processing happen once instead of once per package
+        failed = self.install_packages([
+            "sudo", "env", "DEBIAN_FRONTEND=noninteractive",
+            "apt-get", "install", "-y", "--no-install-recommends",
+            "-o", "Dpkg::Use-Pty=0"
+        ], packages)
+        if not failed:
+            print("✅ Dependencies installed")
+        else:
+            print(f"⚠️ Failed to install: {' '.join(failed)}")
+    
+    def append_missing_lines(self, path, lines, section=None):
+        """Append the lines a root-owned file doesn't have yet, in one write
+        
+        For config.txt-style files pass section="[all]": appended lines
+        would otherwise land in whatever conditional section ([pi4], ...)
+        the file ends with. Returns the lines that were added, or None if
+        the file couldn't be read or written.
+        """
+        try:
+            text = path.read_text()
+        except OSError as e:
+            print(f"⚠️ Cannot read {path}: {e}")
+            return None
+        existing = set(text.splitlines())
+        missing = [line for line in lines if line not in existing]
+        if not missing:
+            return []
+        
+        addition = "\n".join(missing) + "\n"
+        if section:
+            headers = [line.strip() for line in text.splitlines() if line.strip().startswith("[")]
+            if headers and headers[-1] != section:
+                addition = section + "\n" + addition
+        if text and not text.endswith("\n"):
+            addition = "\n" + addition
+        success, _, _ = self.run_command(["sudo", "tee", "-a", str(path)], input=addition)
+        return missing if success else None
     
     def enable_interfaces(self):
         """Enable required hardware interfaces"""
         print("🔌 Enabling hardware interfaces...")
         
-        # Enable I2C
-        self.run_command("sudo raspi-config nonint do_i2c 0")
+        # Edit the files raspi-config would touch directly instead of
+        # running its do_i2c/do_spi/do_serial scripts one after another
+        boot_config = next((p for p in BOOT_CONFIG_PATHS if p.exists()), None)
+        if boot_config is None:
+            print("⚠️ No config.txt found, is this a Raspberry Pi?")
+            return
         
-        # Enable SPI
-        self.run_command("sudo raspi-config nonint do_spi 0")
+        # I2C, SPI and UART
+        added = self.append_missing_lines(boot_config, BOOT_CONFIG_LINES, section="[all]")
         
-        # Enable Serial
-        self.run_command("sudo raspi-config nonint do_serial 0")
+        # Load the I2C userspace driver at boot
+        modules = self.append_missing_lines(Path("/etc/modules"), ["i2c-dev"])
         
-        print("✅ Hardware interfaces enabled")
+        # config.txt is only read at boot; switch I2C and SPI on for the
+        # running kernel too so the service can open the bus right away.
+        # The UART can't be enabled without a reboot
+        self.run_command(["sudo", "dtparam", "i2c_arm=on"])
+        self.run_command(["sudo", "dtparam", "spi=on"])
+        self.run_command(["sudo", "modprobe", "i2c-dev"])
+        
+        if added and "enable_uart=1" in added:
+            self.reboot_required = True
+        
+        if added is not None and modules is not None:
+            print("✅ Hardware interfaces enabled")
+        else:
+            print("⚠️ Failed to enable some hardware interfaces")
     
     def setup_gps(self):
         """Configure GPS daemon"""
         print("📍 Setting up GPS...")
         
         # Configure GPS daemon
-        self.run_command("sudo systemctl enable gpsd")
-        self.run_command("sudo systemctl start gpsd")
+        self.run_command(["sudo", "systemctl", "enable", "gpsd"])
+        self.run_command(["sudo", "systemctl", "start", "gpsd"])
         
         # Test GPS
         print("Testing GPS connection...")
-        success, _, _ = self.run_command("gpspipe -w -n 5", check=False)
+        success, _, _ = self.run_command(["gpspipe", "-w", "-n", "5"], check=False)
         if success:
             print("✅ GPS working correctly")
         else:
@@ -96,29 +231,43 @@ class AutoSetup:
         """Create vehicle node directory and files"""
         print("📁 Creating vehicle node...")
         
-        # Create directory
+        # Create directory (no chdir: other setup steps run concurrently)
         self.setup_dir.mkdir(exist_ok=True)
-        os.chdir(self.setup_dir)
         
-        # Create virtual environment
+        # Create virtual environment; system site-packages exposes the
+        # apt-built modules (python3-cryptography, python3-smbus) so pip
+        # never has to compile them on the Pi
         print("Creating Python virtual environment...")
-        self.run_command("python3 -m venv venv")
+        self.run_command(["python3", "-m", "venv", "--system-site-packages",
+                          str(self.setup_dir / "venv")])
         
         # Activate and install packages
         pip_cmd = str(self.setup_dir / "venv" / "bin" / "pip")
         packages = [
-            "requests", "pynmea2", "smbus2", "psutil", "flask",
-            "flask-cors", "paho-mqtt", "cryptography", "pyjwt"
+            "requests", "pynmea2", "smbus2", "flask",
+            "flask-cors", "paho-mqtt", "pyjwt"
         ]
+        # vehicle_node.py falls back to the stdlib json module without these
+        optional_packages = ["orjson"]
         
-        for package in packages:
-            self.run_command(f"{pip_cmd} install {package}")
+        # Single resolver/cache pass for all packages, wheels only so a
+        # missing binary fails fast instead of starting a gcc build
+        pip_install = [pip_cmd, "install", "--only-binary=:all:", "--no-compile"]
+        failed = self.install_packages(pip_install, packages)
+        for package in optional_packages:
+            success, _, stderr = self.run_command([*pip_install, package])
+            if not success:
+                print(f"⚠️ Optional package {package} not installed, continuing: {stderr.strip()}")
         
-        print("✅ Vehicle node created")
+        if failed:
+            print(f"❌ Vehicle node is missing Python packages: {' '.join(failed)}")
+        else:
+            print("✅ Vehicle node created")
     
     def create_config(self):
         """Create configuration file"""
         print("⚙️ Creating configuration...")
+        self.setup_dir.mkdir(exist_ok=True)
         
         config = {
             "vehicle_id": self.vehicle_id,
@@ -160,6 +309,8 @@ Environment=PATH={self.setup_dir}/venv/bin
 ExecStart={self.setup_dir}/venv/bin/python vehicle_node.py
 Restart=always
 RestartSec=10
+KillSignal=SIGTERM
+TimeoutStopSec=5
 
 [Install]
 WantedBy=multi-user.target
@@ -168,8 +319,8 @@ WantedBy=multi-user.target
         with open("/tmp/geovan-vehicle.service", "w") as f:
             f.write(service_content)
         
-        self.run_command("sudo mv /tmp/geovan-vehicle.service /etc/systemd/system/")
-        self.run_command("sudo systemctl daemon-reload")
+        self.run_command(["sudo", "mv", "/tmp/geovan-vehicle.service", "/etc/systemd/system/"])
+        self.run_command(["sudo", "systemctl", "daemon-reload"])
         
         print("✅ Systemd service created")
     
@@ -177,10 +328,19 @@ WantedBy=multi-user.target
         """Configure firewall"""
         print("🔥 Setting up firewall...")
         
-        self.run_command("sudo ufw --force enable")
-        self.run_command("sudo ufw allow ssh")
-        self.run_command("sudo ufw allow 80")
-        self.run_command("sudo ufw allow 443")
+        # One atomic ruleset load per IP version instead of a ufw run
+        # (and reload) per rule
+        for restore, rules, saved in (
+            ("iptables-restore", FIREWALL_RULES_V4, "/etc/iptables/rules.v4"),
+            ("ip6tables-restore", FIREWALL_RULES_V6, "/etc/iptables/rules.v6"),
+        ):
+            success, _, stderr = self.run_command(["sudo", restore], input=rules)
+            if not success:
+                print(f"⚠️ Firewall setup failed ({restore}): {stderr.strip()}")
+                return
+            
+            # iptables-persistent restores these files on boot
+            self.run_command(["sudo", "tee", saved], input=rules)
         
         print("✅ Firewall configured")
     
@@ -204,12 +364,12 @@ WantedBy=multi-user.target
         """Start the vehicle node service"""
         print("🚀 Starting vehicle node service...")
         
-        self.run_command("sudo systemctl start geovan-vehicle")
-        self.run_command("sudo systemctl enable geovan-vehicle")
+        self.run_command(["sudo", "systemctl", "start", "geovan-vehicle"])
+        self.run_command(["sudo", "systemctl", "enable", "geovan-vehicle"])
         
         # Wait a moment and check status
         time.sleep(3)
-        success, output, _ = self.run_command("sudo systemctl status geovan-vehicle")
+        success, output, _ = self.run_command(["sudo", "systemctl", "status", "geovan-vehicle"])
         
         if success and "active (running)" in output:
             print("✅ Vehicle node service started successfully")
@@ -218,6 +378,11 @@ WantedBy=multi-user.target
             print("❌ Failed to start vehicle node service")
             return False
     
+    def _after(self, prerequisite, step):
+        """Run a setup step once the step it depends on has finished"""
+        prerequisite.result()
+        return step()
+    
     def run(self):
         """Run the complete setup"""
         print("🚗 Starting GeoVAN Auto-Setup...")
@@ -226,33 +391,29 @@ WantedBy=multi-user.target
         print("=" * 50)
         
         try:
-            # Step 1: Update system
-            self.update_system()
-            
-            # Step 2: Install dependencies
-            self.install_dependencies()
-            
-            # Step 3: Enable interfaces
-            self.enable_interfaces()
-            
-            # Step 4: Setup GPS
-            self.setup_gps()
-            
-            # Step 5: Create vehicle node
-            self.create_vehicle_node()
-            
-            # Step 6: Create configuration
-            self.create_config()
-            
-            # Step 7: Create service
-            self.create_service()
-            
-            # Step 8: Setup firewall
-            self.setup_firewall()
-            
-            # Step 9: Test connection
-            if not self.test_connection():
-                print("⚠️ Server connection failed, but continuing...")
+            # Steps 1-9 only partly depend on each other, so run them
+            # concurrently: the critical path becomes
+            # update -> install -> gps/firewall instead of the sum of all steps.
+            # Futures are submitted after their prerequisites, so a worker
+            # blocked in _after() never starves the step it waits on.
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                update = pool.submit(self.update_system)
+                install = pool.submit(self._after, update, self.install_dependencies)
+                steps = {
+                    install: "install_dependencies",
+                    pool.submit(self.enable_interfaces): "enable_interfaces",
+                    pool.submit(self.create_vehicle_node): "create_vehicle_node",
+                    pool.submit(self._after, install, self.setup_gps): "setup_gps",
+                    pool.submit(self._after, install, self.setup_firewall): "setup_firewall",
+                    pool.submit(self.create_config): "create_config",
+                    pool.submit(self.create_service): "create_service",
+                    pool.submit(self.test_connection): "test_connection",
+                }
+                
+                for future in as_completed(steps):
+                    result = future.result()
+                    if steps[future] == "test_connection" and not result:
+                        print("⚠️ Server connection failed, but continuing...")
             
             # Step 10: Start service
             if self.start_service():
@@ -263,6 +424,10 @@ WantedBy=multi-user.target
             else:
                 print("\n❌ Setup completed with errors")
                 print("Check logs for details")
+            
+            if self.reboot_required:
+                print("\n⚠️ Reboot required: the serial port (GPS) is only enabled after a reboot")
+                print("Run: sudo reboot")
                 
         except Exception as e:
             print(f"\n❌ Setup failed: {e}")
@@ -271,7 +436,14 @@ WantedBy=multi-user.target
         return True
 
 if __name__ == "__main__":
-    setup = AutoSetup()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='GeoVAN Auto-Setup for Raspberry Pi')
+    parser.add_argument('--force-update', action='store_true',
+                        help='Run apt-get update even if package lists are fresh')
+    args = parser.parse_args()
+    
+    setup = AutoSetup(force_update=args.force_update)
     success = setup.run()
     
     if success:
@@ -226,6 +226,8 @@ Environment=PATH={self.setup_dir}/venv/bin
 ExecStart={self.setup_dir}/venv/bin/python vehicle_node.py
 Restart=always
 RestartSec=10
+KillSignal=SIGTERM
+TimeoutStopSec=5
 
 [Install]
 WantedBy=multi-user.target
@@ -121,6 +121,8 @@ Environment=PATH=/home/pi/geovan-vehicle-node/venv/bin
 ExecStart=/home/pi/geovan-vehicle-node/venv/bin/python vehicle_node.py
 Restart=always
 RestartSec=10
+KillSignal=SIGTERM
+TimeoutStopSec=5
 
 [Install]
 WantedBy=multi-user.target
@@ -8,21 +8,80 @@ import time
 import json
 import threading
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import socket
+import struct
+import array
+import fcntl
+import os
+import hashlib
+import itertools
+import gzip
 import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from urllib.parse import urlsplit
 from typing import Dict, Any, Optional
 import logging
+import signal
 
-# GPS and sensor libraries (install with: pip install gps pynmea2 smbus2)
+# GPS and sensor libraries (install with: pip install pynmea2 smbus2)
+# gpsd itself is read over its JSON socket, see init_sensors()
 try:
-    import gps
     import pynmea2
     from smbus2 import SMBus
 except ImportError:
-    print("Install required packages: pip install gps pynmea2 smbus2")
+    print("Install required packages: pip install pynmea2 smbus2")
     exit(1)
 
+# orjson encodes straight to bytes and is several times faster than json
+# on the Pi; fall back to the stdlib encoder when it is not installed
+try:
+    import orjson
+
+    dumps = orjson.dumps
+    loads = orjson.loads
+except ImportError:
+    def dumps(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(',', ':')).encode()
+
+    loads = json.loads
+
+SIOCGIWESSID = 0x8B1B  # wireless extensions ioctl, see <linux/wireless.h>
+IW_ESSID_MAX_SIZE = 32
+GPSD_ADDRESS = ('127.0.0.1', 2947)
+GPSD_WATCH = b'?WATCH={"enable":true,"json":true}\n'
+LATENCY_CACHE_SECONDS = 30
+DISK_USAGE_CACHE_SECONDS = 60
+MPU6050_ACCEL_LSB_PER_G = 16384.0  # default +-2g range
+HMC5883L_LSB_PER_GAUSS = 1090.0  # default 1.3 Ga gain
+MAX_BUFFERED_SAMPLES = 50  # samples kept between transmissions
+STOP_TIMEOUT_SECONDS = 4  # must stay below the unit's TimeoutStopSec=5
+GZIP_MIN_BYTES = 1024  # smaller bodies go out uncompressed
+STATIC_SAMPLE_KEYS = ('name', 'metadata', 'security')  # pre-encoded in __init__
+
+# Constant part of every packet's 'security' block; the per-tick fields
+# (lastSignature) are added in collect_data
+STATIC_SECURITY = {
+    'trustScore': 95.0,  # High trust for IoT nodes
+    'certificateValid': True,
+    'encryptionLevel': 'AES-256'
+}
+
+_iso_cache = (None, '')
+
+def iso_now() -> str:
+    """Current UTC time in ISO 8601, formatted at most once per second"""
+    global _iso_cache
+    second = int(time.time())
+    cached_second, cached = _iso_cache
+    if second != cached_second:
+        cached = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(second))
+        _iso_cache = (second, cached)
+    return cached
+
 class VehicleNode:
     def __init__(self, vehicle_id: str, server_url: str, wifi_ssid: str, wifi_password: str):
         self.vehicle_id = vehicle_id
@@ -43,15 +102,20 @@ class VehicleNode:
             'autonomousLevel': 0
         }
         
-        # Initialize sensors
-        self.init_sensors()
+        # Fields that never change between samples are JSON-encoded once
+        # here; encode_sample() only serializes the per-tick remainder
+        self._static_json = dumps({
+            'name': self.vehicle_config['name'],
+            'metadata': self.vehicle_config
+        })[1:-1]
+        self._static_security_json = dumps(STATIC_SECURITY)[1:-1]
         
-        # Data storage
-        self.current_data = {}
-        self.last_position = None
-        self.last_update = datetime.now()
+        # SHA-256 state with the vehicle ID already absorbed; copied per
+        # signature so only the per-packet part has to be hashed
+        self._sig_prefix = hashlib.sha256(vehicle_id.encode())
+        self._sig_counter = itertools.count()
         
-        # Setup logging
+        # Setup logging (before init_sensors, which logs)
         logging.basicConfig(
             level=logging.INFO,
             format='%(asctime)s - %(levelname)s - %(message)s',
@@ -62,20 +126,65 @@ class VehicleNode:
         )
         self.logger = logging.getLogger(f'Vehicle-{vehicle_id}')
         
-        # Threading
+        # Initialize sensors
+        self.init_sensors()
+        
+        # Data storage
+        self.current_data = {}
+        self.pending_samples = deque(maxlen=MAX_BUFFERED_SAMPLES)
+        self.samples_lock = threading.Lock()  # guards pending_samples swaps
+        self.last_position = None
+        self.last_update = datetime.now()
+        
+        # Latency is re-measured at most every LATENCY_CACHE_SECONDS
+        self._latency = 999.0
+        self._latency_measured_at = None
+        
+        # Hardware stats files stay open and are re-read with seek(0);
+        # disk usage barely moves so statvfs() runs at most once a minute
+        self._meminfo = self.open_stat_file('/proc/meminfo')
+        self._cpu_temp = self.open_stat_file('/sys/class/thermal/thermal_zone0/temp')
+        self._disk_usage = 0.0
+        self._disk_usage_checked_at = None
+        
+        # One keep-alive connection to the server, reused for every
+        # transmission to skip DNS, TCP and TLS setup each time
+        self.session = requests.Session()
+        self.session.mount(self.server_url, HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=1,
+            max_retries=Retry(total=3, backoff_factor=0.5)
+        ))
+        self.session.headers.update({
+            'Content-Type': 'application/json',
+            'Connection': 'keep-alive'
+        })
+        
+        # Threading; loops wait on stop_event so stop() wakes them at once
         self.running = False
+        self.stop_event = threading.Event()
+        
+        # Readers that can block on I/O (I2C bus, network) run here in
+        # parallel so a tick costs the slowest reader, not their sum
+        self.reader_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='reader')
         self.data_thread = None
         self.transmission_thread = None
 
     def init_sensors(self):
         """Initialize GPS and sensor hardware"""
+        # Latest TPV fix, replaced wholesale by gps_reader_loop
+        self._latest_tpv = None
+        self.gps_thread = None
+
         try:
-            # GPS setup
-            self.gps_session = gps.gps(mode=gps.WATCH_ENABLE)
+            # GPS setup: stream JSON reports straight from gpsd
+            self.gps_sock = socket.create_connection(GPSD_ADDRESS, timeout=2)
+            self.gps_sock.sendall(GPSD_WATCH)
+            self.gps_sock.settimeout(1)  # lets the reader notice stop()
             self.logger.info("GPS initialized successfully")
         except Exception as e:
             self.logger.error(f"GPS initialization failed: {e}")
-            self.gps_session = None
+            self.gps_sock = None
 
         try:
             # I2C bus for sensors
@@ -92,39 +201,77 @@ class VehicleNode:
             'compass': 0x1E,  # HMC5883L
         }
 
-    def get_gps_data(self) -> Optional[Dict[str, Any]]:
-        """Get real GPS data from hardware"""
-        if not self.gps_session:
-            return None
+        # Register layouts for block reads, compiled once
+        self.mpu6050_struct = struct.Struct('>hhhhhhh')  # accel xyz, temp, gyro xyz
+        self.hmc5883l_struct = struct.Struct('>hhh')  # x, z, y
+
+        # Optional motion sensors: probed once here, and switched off after
+        # a failed read, so an unwired device costs one warning, not an
+        # error line per tick
+        self.has_accelerometer = self.probe_sensor('accelerometer', 0x6B, 0x00)  # wake MPU6050 (PWR_MGMT_1)
+        self.has_compass = self.probe_sensor('compass', 0x02, 0x00)  # HMC5883L continuous mode
 
+    def gps_reader_loop(self):
+        """Consume gpsd reports in the background, keeping only the latest fix"""
+        buffer = b''
         try:
-            # Read GPS data
-            report = self.gps_session.next()
-            
-            if report['class'] == 'TPV':
-                return {
-                    'lat': getattr(report, 'lat', 0.0),
-                    'lng': getattr(report, 'lon', 0.0),
-                    'accuracy': getattr(report, 'epx', 5.0),  # Position uncertainty
-                    'speed': getattr(report, 'speed', 0.0) * 3.6,  # Convert m/s to km/h
-                    'heading': getattr(report, 'track', 0.0),
-                    'altitude': getattr(report, 'alt', 0.0),
-                    'timestamp': datetime.now().isoformat()
-                }
-            elif report['class'] == 'SKY':
-                # Satellite information
-                satellites = getattr(report, 'satellites', [])
-                return {
-                    'satellites': len(satellites),
-                    'hdop': getattr(report, 'hdop', 0.0),
-                    'vdop': getattr(report, 'vdop', 0.0)
-                }
-                
+            while self.running:
+                try:
+                    chunk = self.gps_sock.recv(4096)
+                except socket.timeout:
+                    continue
+                except OSError as e:
+                    self.logger.error(f"GPS read error: {e}")
+                    break
+
+                if not chunk:
+                    self.logger.error("GPS read error: gpsd closed the connection")
+                    break
+
+                buffer += chunk
+                *lines, buffer = buffer.split(b'\n')
+                for line in lines:
+                    try:
+                        report = loads(line)
+                        if isinstance(report, dict) and report.get('class') == 'TPV':
+                            self._latest_tpv = self.parse_tpv(report)
+                    except (ValueError, TypeError) as e:
+                        self.logger.warning(f"Ignoring malformed GPS report: {e}")
         except Exception as e:
-            self.logger.error(f"GPS read error: {e}")
+            self.logger.error(f"GPS reader stopped: {e}")
+        finally:
+            # Never leave a stale fix behind to be reported as current
+            self._latest_tpv = None
+
+    def parse_tpv(self, report: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Convert a gpsd TPV report into our position dict, None without a fix"""
+        if report.get('mode', 0) < 2:
             return None
 
-        return None
+        return {
+            'lat': report.get('lat', 0.0),
+            'lng': report.get('lon', 0.0),
+            'accuracy': report.get('epx', 5.0),  # Position uncertainty
+            'speed': report.get('speed', 0.0) * 3.6,  # Convert m/s to km/h
+            'heading': report.get('track', 0.0),
+            'altitude': report.get('alt', 0.0),
+            'timestamp': iso_now()
+        }
+
+    def probe_sensor(self, name: str, register: int, value: int) -> bool:
+        """Write a sensor's setup register; False if the device doesn't answer"""
+        if not self.i2c_bus:
+            return False
+        try:
+            self.i2c_bus.write_byte_data(self.sensor_addresses[name], register, value)
+            return True
+        except Exception as e:
+            self.logger.warning(f"No {name} found, disabling it: {e}")
+            return False
+
+    def get_gps_data(self) -> Optional[Dict[str, Any]]:
+        """Get the most recent GPS fix"""
+        return self._latest_tpv
 
     def get_sensor_data(self) -> Dict[str, Any]:
         """Get sensor data from I2C devices"""
@@ -152,6 +299,38 @@ class VehicleNode:
         except Exception as e:
             self.logger.error(f"Sensor read error: {e}")
 
+        if self.has_accelerometer:
+            try:
+                # MPU6050: accel, temp and gyro in a single 14-byte transaction
+                raw = self.i2c_bus.read_i2c_block_data(
+                    self.sensor_addresses['accelerometer'], 0x3B, 14
+                )
+                ax, ay, az = self.mpu6050_struct.unpack(bytes(raw))[:3]
+                sensor_data['accelerometer'] = {
+                    'x': ax / MPU6050_ACCEL_LSB_PER_G,
+                    'y': ay / MPU6050_ACCEL_LSB_PER_G,
+                    'z': az / MPU6050_ACCEL_LSB_PER_G
+                }
+            except Exception as e:
+                self.logger.warning(f"Accelerometer read error, disabling it: {e}")
+                self.has_accelerometer = False
+
+        if self.has_compass:
+            try:
+                # HMC5883L: all three axes from one 6-byte block at 0x03
+                raw = self.i2c_bus.read_i2c_block_data(
+                    self.sensor_addresses['compass'], 0x03, 6
+                )
+                mx, mz, my = self.hmc5883l_struct.unpack(bytes(raw))
+                sensor_data['compass'] = {
+                    'x': mx / HMC5883L_LSB_PER_GAUSS,
+                    'y': my / HMC5883L_LSB_PER_GAUSS,
+                    'z': mz / HMC5883L_LSB_PER_GAUSS
+                }
+            except Exception as e:
+                self.logger.warning(f"Compass read error, disabling it: {e}")
+                self.has_compass = False
+
         return sensor_data
 
     def get_network_info(self) -> Dict[str, Any]:
@@ -186,63 +365,58 @@ class VehicleNode:
     def get_wifi_info(self) -> Dict[str, Any]:
         """Get WiFi connection information"""
         try:
-            # Parse iwconfig or similar command output
-            import subprocess
-            result = subprocess.run(['iwconfig'], capture_output=True, text=True)
+            # /proc/net/wireless has one line per wireless interface after
+            # two header lines: "wlan0: 0000   70.  -40.  -256 ..."
+            with open('/proc/net/wireless', 'r') as f:
+                lines = f.readlines()[2:]
             
-            if result.returncode == 0:
-                output = result.stdout
-                # Parse SSID and signal strength
-                # This is a simplified parser - adjust based on your system
-                ssid = 'Unknown'
-                signal = 0
-                
-                if 'ESSID:' in output:
-                    ssid_start = output.find('ESSID:') + 6
-                    ssid_end = output.find('"', ssid_start + 1)
-                    if ssid_end > ssid_start:
-                        ssid = output[ssid_start:ssid_end]
-                
-                if 'Signal level=' in output:
-                    signal_start = output.find('Signal level=') + 13
-                    signal_end = output.find(' ', signal_start)
-                    if signal_end > signal_start:
-                        try:
-                            signal = int(output[signal_start:signal_end])
-                        except ValueError:
-                            signal = 0
-                
-                return {'ssid': ssid, 'signal': signal}
+            for line in lines:
+                fields = line.split()
+                if len(fields) < 4:
+                    continue
+                ifname = fields[0].rstrip(':')
+                signal = int(float(fields[3]))
+                return {'ssid': self.get_ssid(ifname), 'signal': signal}
         except Exception as e:
             self.logger.error(f"WiFi info error: {e}")
         
         return {'ssid': 'Unknown', 'signal': 0}
 
+    def get_ssid(self, ifname: str) -> str:
+        """Get the ESSID of a wireless interface via the SIOCGIWESSID ioctl"""
+        essid = array.array('B', bytes(IW_ESSID_MAX_SIZE + 1))
+        address, length = essid.buffer_info()
+        # struct iwreq: char ifname[16] + struct iw_point {void *pointer; u16 length; u16 flags}
+        request = struct.pack('16sPHH', ifname.encode(), address, length, 0)
+        # The iwreq_data union is 16 bytes, pad up to sizeof(struct iwreq)
+        request += bytes(16 + 16 - len(request))
+        
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            result = fcntl.ioctl(sock.fileno(), SIOCGIWESSID, request)
+        
+        ssid_length = struct.unpack_from('16sPHH', result)[2]
+        return essid.tobytes()[:ssid_length].decode('utf-8', 'replace') or 'Unknown'
+
     def measure_latency(self) -> float:
-        """Measure network latency to server"""
+        """Measure network latency to server (TCP connect time, cached)"""
+        now = time.monotonic()
+        if (self._latency_measured_at is not None
+                and now - self._latency_measured_at < LATENCY_CACHE_SECONDS):
+            return self._latency
+        
+        self._latency_measured_at = now
         try:
-            import subprocess
-            # Ping the server to measure latency
-            result = subprocess.run(
-                ['ping', '-c', '1', self.server_url.replace('http://', '').replace('https://', '')],
-                capture_output=True, text=True
-            )
-            
-            if result.returncode == 0:
-                # Parse ping output for time
-                output = result.stdout
-                if 'time=' in output:
-                    time_start = output.find('time=') + 5
-                    time_end = output.find('ms', time_start)
-                    if time_end > time_start:
-                        try:
-                            return float(output[time_start:time_end])
-                        except ValueError:
-                            pass
+            url = urlsplit(self.server_url)
+            port = url.port or (443 if url.scheme == 'https' else 80)
+            start = time.perf_counter()
+            with socket.create_connection((url.hostname, port), timeout=2):
+                pass
+            self._latency = (time.perf_counter() - start) * 1000.0
         except Exception as e:
             self.logger.error(f"Latency measurement error: {e}")
+            self._latency = 999.0
         
-        return 999.0
+        return self._latency
 
     def measure_bandwidth(self) -> float:
         """Measure network bandwidth (simplified)"""
@@ -253,19 +427,27 @@ class VehicleNode:
     def collect_data(self):
         """Collect all vehicle data"""
         try:
-            # GPS data
-            gps_data = self.get_gps_data()
+            # Sensor and network data
+            sensor_future = self.reader_pool.submit(self.get_sensor_data)
+            network_future = self.reader_pool.submit(self.get_network_info)
             
-            # Sensor data
-            sensor_data = self.get_sensor_data()
+            # GPS fix and hardware stats are cheap cached/procfs reads,
+            # done here while the pool works
+            gps_data = self.get_gps_data()
+            hardware = {
+                'cpu_temp': self.get_cpu_temperature(),
+                'memory_usage': self.get_memory_usage(),
+                'disk_usage': self.get_disk_usage()
+            }
             
-            # Network data
-            network_data = self.get_network_info()
+            sensor_data = sensor_future.result()
+            network_data = network_future.result()
             
             # Calculate vehicle status
             status = self.calculate_status(gps_data, sensor_data, network_data)
             
             # Create vehicle data packet
+            now = iso_now()
             vehicle_data = {
                 'id': self.vehicle_id,
                 'name': self.vehicle_config['name'],
@@ -290,22 +472,18 @@ class VehicleNode:
                     'compass': sensor_data['compass']
                 },
                 'security': {
-                    'trustScore': 95.0,  # High trust for IoT nodes
-                    'certificateValid': True,
-                    'lastSignature': self.generate_signature(),
-                    'encryptionLevel': 'AES-256'
+                    **STATIC_SECURITY,
+                    'lastSignature': self.generate_signature()
                 },
                 'network': network_data,
-                'timestamp': datetime.now().isoformat(),
-                'lastUpdate': datetime.now().isoformat(),
-                'hardware': {
-                    'cpu_temp': self.get_cpu_temperature(),
-                    'memory_usage': self.get_memory_usage(),
-                    'disk_usage': self.get_disk_usage()
-                }
+                'timestamp': now,
+                'lastUpdate': now,
+                'hardware': hardware
             }
             
             self.current_data = vehicle_data
+            with self.samples_lock:
+                self.pending_samples.append(vehicle_data)
             self.last_update = datetime.now()
             
             if gps_data:
@@ -331,99 +509,186 @@ class VehicleNode:
 
     def generate_signature(self) -> str:
         """Generate a unique signature for the data packet"""
-        import hashlib
-        data_string = f"{self.vehicle_id}{datetime.now().isoformat()}"
-        return hashlib.sha256(data_string.encode()).hexdigest()
+        # Nanosecond clock plus a packet counter: iso_now() only changes
+        # once a second, so back-to-back ticks would sign identically
+        h = self._sig_prefix.copy()
+        h.update(f"{time.time_ns()}:{next(self._sig_counter)}".encode())
+        return h.hexdigest()
+
+    def open_stat_file(self, path: str):
+        """Open a procfs/sysfs file for repeated reads, None if unavailable"""
+        try:
+            return open(path, 'rb', buffering=0)
+        except OSError:
+            return None
+
+    def read_stat_file(self, f) -> bytes:
+        """Re-read a file opened with open_stat_file from the start"""
+        f.seek(0)
+        return f.read(256)
 
     def get_cpu_temperature(self) -> float:
         """Get Raspberry Pi CPU temperature"""
+        if not self._cpu_temp:
+            return 0.0
         try:
-            with open('/sys/class/thermal/thermal_zone0/temp', 'r') as f:
-                temp = float(f.read()) / 1000.0
-            return temp
-        except:
+            return int(self.read_stat_file(self._cpu_temp)) / 1000.0
+        except (OSError, ValueError):
             return 0.0
 
     def get_memory_usage(self) -> float:
         """Get memory usage percentage"""
+        if not self._meminfo:
+            return 0.0
         try:
-            import psutil
-            return psutil.virtual_memory().percent
-        except:
+            # MemTotal and MemAvailable are the first and third lines, in kB
+            lines = self.read_stat_file(self._meminfo).split(b'\n')
+            total = int(lines[0].split()[1])
+            available = int(lines[2].split()[1])
+            return round((total - available) / total * 100, 1)
+        except (OSError, ValueError, IndexError, ZeroDivisionError):
             return 0.0
 
     def get_disk_usage(self) -> float:
         """Get disk usage percentage"""
+        now = time.monotonic()
+        if (self._disk_usage_checked_at is not None
+                and now - self._disk_usage_checked_at < DISK_USAGE_CACHE_SECONDS):
+            return self._disk_usage
+        
+        self._disk_usage_checked_at = now
         try:
-            import psutil
-            return psutil.disk_usage('/').percent
-        except:
-            return 0.0
+            st = os.statvfs('/')
+            used = st.f_blocks - st.f_bfree
+            self._disk_usage = round(used / (used + st.f_bavail) * 100, 1)
+        except (OSError, ZeroDivisionError):
+            self._disk_usage = 0.0
+        return self._disk_usage
+
+    def encode_sample(self, sample: Dict[str, Any]) -> bytes:
+        """Serialize a data packet, reusing the pre-encoded static fields"""
+        dynamic = {k: v for k, v in sample.items() if k not in STATIC_SAMPLE_KEYS}
+        security = {k: v for k, v in sample['security'].items() if k not in STATIC_SECURITY}
+        security_tail = b',' + dumps(security)[1:] if security else b'}'
+        # One join instead of chained +, memoryview slices avoid copies
+        return b''.join((
+            b'{', self._static_json,
+            b',"security":{', self._static_security_json, security_tail,
+            b',', memoryview(dumps(dynamic))[1:]
+        ))
 
     def transmit_data(self):
         """Transmit data to central server"""
-        if not self.current_data:
+        if not self.pending_samples:
             return
         
+        # Take everything collected since the last transmission
+        with self.samples_lock:
+            samples = list(self.pending_samples)
+            self.pending_samples.clear()
+        
+        retry = False
         try:
             # Prepare data for transmission
-            transmission_data = {
+            encoded = [self.encode_sample(sample) for sample in samples]
+            envelope = dumps({
                 'vehicle_id': self.vehicle_id,
-                'data': self.current_data,
-                'timestamp': datetime.now().isoformat(),
-                'checksum': self.generate_signature()
-            }
+                'timestamp': iso_now(),
+                # Signed once per tick in collect_data, no need to rehash
+                'checksum': samples[-1]['security']['lastSignature']
+            })
+            body = b''.join((
+                memoryview(envelope)[:-1],
+                b',"data":', encoded[-1],
+                b',"samples":[', b','.join(encoded), b']}'
+            ))
+            
+            # Batches of repetitive JSON compress several times over;
+            # level 1 is nearly free on the Pi's CPU
+            headers = None
+            if len(body) >= GZIP_MIN_BYTES:
+                body = gzip.compress(body, compresslevel=1)
+                headers = {'Content-Encoding': 'gzip'}
             
             # Send to server
-            response = requests.post(
+            response = self.session.post(
                 f"{self.server_url}/api/vehicle/update",
-                json=transmission_data,
-                headers={'Content-Type': 'application/json'},
+                data=body,
+                headers=headers,
                 timeout=10
             )
             
             if response.status_code == 200:
-                self.logger.info("Data transmitted successfully")
+                self.logger.info(f"Data transmitted successfully ({len(samples)} samples)")
+            elif response.status_code >= 500:
+                retry = True
+                self.logger.warning(f"Transmission failed: {response.status_code}, will retry")
             else:
-                self.logger.warning(f"Transmission failed: {response.status_code}")
+                # The server rejected this batch; resending it won't help
+                self.logger.warning(f"Transmission failed: {response.status_code}, dropping {len(samples)} samples")
                 
         except requests.exceptions.RequestException as e:
+            retry = True
             self.logger.error(f"Transmission error: {e}")
         except Exception as e:
+            # e.g. a sample that can't be encoded: drop the batch rather
+            # than block every later upload on it
             self.logger.error(f"Unexpected transmission error: {e}")
+        
+        if retry:
+            # Put the batch back ahead of what was collected meanwhile; at
+            # maxlen the oldest samples are evicted, so the newest survive
+            with self.samples_lock:
+                self.pending_samples = deque(
+                    [*samples, *self.pending_samples], maxlen=MAX_BUFFERED_SAMPLES
+                )
 
-    def data_collection_loop(self):
-        """Main data collection loop"""
+    def run_periodic(self, task, interval: float, error_backoff: float, error_message: str):
+        """Run task every interval seconds on a monotonic schedule until stopped"""
+        # Ticks land on fixed deadlines, so the task's own run time doesn't
+        # stretch the period; after an overrun we resync instead of bursting
+        next_tick = time.monotonic()
         while self.running:
             try:
-                self.collect_data()
-                time.sleep(1)  # Collect data every second
+                task()
+                next_tick += interval
             except Exception as e:
-                self.logger.error(f"Data collection loop error: {e}")
-                time.sleep(5)
+                self.logger.error(f"{error_message}: {e}")
+                next_tick = time.monotonic() + error_backoff
+            
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                self.stop_event.wait(delay)
+            else:
+                next_tick = time.monotonic()
+
+    def data_collection_loop(self):
+        """Main data collection loop"""
+        self.run_periodic(self.collect_data, 1, 5, "Data collection loop error")  # Collect data every second
 
     def transmission_loop(self):
         """Main transmission loop"""
-        while self.running:
-            try:
-                self.transmit_data()
-                time.sleep(5)  # Transmit every 5 seconds
-            except Exception as e:
-                self.logger.error(f"Transmission loop error: {e}")
-                time.sleep(10)
+        self.run_periodic(self.transmit_data, 5, 10, "Transmission loop error")  # Transmit every 5 seconds
 
     def start(self):
         """Start the vehicle node"""
         self.logger.info(f"Starting Vehicle Node {self.vehicle_id}")
         self.running = True
+        self.stop_event.clear()
+        
+        # Start GPS reader thread
+        if self.gps_sock:
+            self.gps_thread = threading.Thread(target=self.gps_reader_loop, name="gps-reader")
+            self.gps_thread.daemon = True
+            self.gps_thread.start()
         
         # Start data collection thread
-        self.data_thread = threading.Thread(target=self.data_collection_loop)
+        self.data_thread = threading.Thread(target=self.data_collection_loop, name="data-collection")
         self.data_thread.daemon = True
         self.data_thread.start()
         
         # Start transmission thread
-        self.transmission_thread = threading.Thread(target=self.transmission_loop)
+        self.transmission_thread = threading.Thread(target=self.transmission_loop, name="transmission")
         self.transmission_thread.daemon = True
         self.transmission_thread.start()
         
@@ -433,19 +698,32 @@ class VehicleNode:
         """Stop the vehicle node"""
         self.logger.info("Stopping vehicle node...")
         self.running = False
+        self.stop_event.set()
         
-        if self.data_thread:
-            self.data_thread.join(timeout=5)
+        # All joins share one deadline so systemd never has to SIGKILL us.
+        # A POST stuck in its 10 s timeout is abandoned; the threads are
+        # daemons and die with the process
+        deadline = time.monotonic() + STOP_TIMEOUT_SECONDS
+        for thread in (self.data_thread, self.transmission_thread, self.gps_thread):
+            if thread:
+                thread.join(timeout=max(0.0, deadline - time.monotonic()))
+                if thread.is_alive():
+                    self.logger.warning(f"{thread.name} did not stop in time, abandoning it")
         
-        if self.transmission_thread:
-            self.transmission_thread.join(timeout=5)
+        self.reader_pool.shutdown(wait=False)
         
-        if self.gps_session:
-            self.gps_session.close()
+        if self.gps_sock:
+            self.gps_sock.close()
         
         if self.i2c_bus:
             self.i2c_bus.close()
         
+        for f in (self._meminfo, self._cpu_temp):
+            if f:
+                f.close()
+        
+        self.session.close()
+        
         self.logger.info("Vehicle node stopped")
 
 def main():
@@ -468,16 +746,16 @@ def main():
         wifi_password=args.wifi_password or ''
     )
     
-    try:
-        vehicle_node.start()
-        
-        # Keep main thread alive
-        while True:
-            time.sleep(1)
-            
-    except KeyboardInterrupt:
-        print("\nShutting down...")
-        vehicle_node.stop()
+    # Sleep until Ctrl+C or systemd's SIGTERM instead of waking every second
+    shutdown = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: shutdown.set())
+    signal.signal(signal.SIGINT, lambda *_: shutdown.set())
+    
+    vehicle_node.start()
+    shutdown.wait()
+    
+    print("\nShutting down...")
+    vehicle_node.stop()
 
 if __name__ == "__main__":
     main()